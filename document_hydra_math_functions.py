@@ -11,13 +11,176 @@ This script will:
 import os
 import sys
 import re
+import bisect
+import mmap
 from pathlib import Path
 
+from source_tree_utils import buffer_stdout, iter_source_files, rewrite_files
+
+# Regular expression to match function declarations
+# This pattern matches function declarations in both .hpp and .cpp files.
+# Every part is bounded to a single construct (no .* and no DOTALL) so a
+# failed match cannot backtrack across the rest of the file.
+FUNC_PATTERN = re.compile(r'^[ \t]*(?:virtual\s+)?(?:static\s+)?(?:inline\s+)?(?:explicit\s+)?'
+                          r'((?:const\s+)?(?:[\w:]+(?:<[^<>;{}\n]*>)?[ \t*&]+)*)'  # return type
+                          r'([\w~]+(?:<[^<>;{}\n]*>)?)'  # function name
+                          r'[ \t]*\(([^()]*)\)'  # parameters
+                          r'(?:\s*const)?'  # const qualifier
+                          r'(?:\s*noexcept)?'  # noexcept specifier
+                          r'(?:\s*override)?'  # override specifier
+                          r'(?:\s*=\s*0)?'  # pure virtual
+                          r'(?:\s*\{|\s*;)', re.MULTILINE)
+
+# Bytes variant of FUNC_PATTERN for scanning memory-mapped files before decoding
+FUNC_PATTERN_BYTES = re.compile(FUNC_PATTERN.pattern.encode(), re.MULTILINE)
+
+# Regular expression to match existing documentation
+DOC_PATTERN = re.compile(r'/\*\*.*?\*/\s*$|///.*$', re.MULTILINE | re.DOTALL)
+
+# Characters that affect how a parameter list is split
+PARAM_DELIMITER_PATTERN = re.compile(r'[<>,]')
+
+def split_params(params_str):
+    """
+    Split a parameter list on the commas that are not inside template brackets.
+    
+    Only the delimiter characters are visited in Python; the scan between
+    them is done by the regex engine.
+    
+    Args:
+        params_str: The text between the parentheses of a function declaration
+    
+    Returns:
+        list: The stripped, non-empty parameter declarations
+    """
+    params = []
+    bracket_count = 0
+    start = 0
+    for match in PARAM_DELIMITER_PATTERN.finditer(params_str):
+        char = match.group()
+        if char == '<':
+            bracket_count += 1
+        elif char == '>':
+            bracket_count -= 1
+        elif bracket_count == 0:
+            params.append(params_str[start:match.start()])
+            start = match.end()
+    params.append(params_str[start:])
+    return [param.strip() for param in params if param.strip()]
+
+def generate_documentation(func_name, params, return_type, line_ending="\n"):
+    """Generate documentation comment for a function, using line_ending between lines."""
+    doc = "/**\n"
+    doc += f" * @brief {func_name}\n"
+    doc += " *\n"
+    
+    # Add parameter documentation
+    for param in params:
+        param_name = param.strip().split()[-1].replace("&", "").replace("*", "")
+        doc += f" * @param {param_name} Description of {param_name}\n"
+    
+    # Add return documentation if not void
+    if return_type and return_type.strip() != "void":
+        doc += " *\n"
+        doc += " * @return Description of return value\n"
+    
+    doc += " */\n"
+    if line_ending != "\n":
+        doc = doc.replace("\n", line_ending)
+    return doc
+
+def document_file(filepath):
+    """
+    Add documentation to the undocumented functions of a single file.
+    
+    Runs in a worker process, so it only reads the file and leaves writing
+    the result to the caller.
+    
+    Args:
+        filepath: Path of the .hpp or .cpp file to process
+    
+    Returns:
+        tuple: (filepath, modified_content, messages) - modified_content is None
+        if no changes are needed, messages are the log lines for this file
+    """
+    filename = os.path.basename(filepath)
+    messages = []
+    
+    # Map the file and only decode it if it declares any functions at all
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return filepath, None, messages
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            # Every declaration needs a '(' and a terminating '{' or ';', which
+            # plain byte searches rule out far more cheaply than the regex
+            if mm.find(b'(') == -1 or (mm.find(b'{') == -1 and mm.find(b';') == -1):
+                return filepath, None, messages
+            if FUNC_PATTERN_BYTES.search(mm) is None:
+                return filepath, None, messages
+            content = mm[:].decode('utf-8', errors='ignore')
+    
+    # Offsets at which each line starts, for mapping matches to line numbers
+    line_starts = [0]
+    newline = content.find('\n')
+    while newline != -1:
+        line_starts.append(newline + 1)
+        newline = content.find('\n', newline + 1)
+    
+    # The content is decoded without newline translation, so generated
+    # documentation has to use the file's own line endings
+    line_ending = '\r\n' if '\r\n' in content else '\n'
+    
+    # Unchanged slices of content interleaved with generated documentation
+    output = []
+    prev = 0
+    
+    # Find function declarations
+    for match in FUNC_PATTERN.finditer(content):
+        # Get function details
+        return_type = match.group(1).strip()
+        func_name = match.group(2).strip()
+        params_str = match.group(3).strip()
+        
+        # Skip if it's a constructor or destructor
+        if func_name.startswith('~') or func_name == filename.split('.')[0]:
+            continue
+        
+        # Parse parameters
+        params = split_params(params_str)
+        
+        # Get the start line of the function
+        func_start_line = bisect.bisect_right(line_starts, match.start()) - 1
+        
+        # Check if there's already documentation in the 5 lines above
+        window = content[line_starts[max(0, func_start_line - 5)]:line_starts[func_start_line]]
+        has_doc = '/**' in window or '///' in window
+        
+        # Add documentation if not already present
+        if not has_doc:
+            # Generate documentation
+            doc = generate_documentation(func_name, params, return_type, line_ending)
+            
+            # Insert documentation before the line the function starts on
+            line_start = line_starts[func_start_line]
+            output.append(content[prev:line_start])
+            output.append(doc)
+            prev = line_start
+            messages.append(f"In {filepath}:")
+            messages.append(f"  Adding documentation for function: {func_name}")
+    
+    if not output:
+        return filepath, None, messages
+    
+    output.append(content[prev:])
+    return filepath, ''.join(output), messages
+
 def document_functions(directory, dry_run=False):
     """
     Find all .hpp and .cpp files in the hydra_math directory and add
     documentation to undocumented functions.
     
+    Files are analysed in parallel worker processes by rewrite_files.
+    
     Args:
         directory: The root directory to start the search from
         dry_run: If True, only print changes without modifying files
@@ -25,135 +188,14 @@ def document_functions(directory, dry_run=False):
     Returns:
         tuple: (updated_files, skipped_files) - Lists of updated and skipped files
     """
-    updated_files = []
-    skipped_files = []
-    
-    # Function to generate documentation for a function
-    def generate_documentation(func_name, params, return_type):
-        """Generate documentation comment for a function."""
-        doc = "/**\n"
-        doc += f" * @brief {func_name}\n"
-        doc += " *\n"
-        
-        # Add parameter documentation
-        for param in params:
-            param_name = param.strip().split()[-1].replace("&", "").replace("*", "")
-            doc += f" * @param {param_name} Description of {param_name}\n"
-        
-        # Add return documentation if not void
-        if return_type and return_type.strip() != "void":
-            doc += " *\n"
-            doc += " * @return Description of return value\n"
-        
-        doc += " */\n"
-        return doc
-    
-    # Regular expression to match function declarations
-    # This pattern matches function declarations in both .hpp and .cpp files
-    func_pattern = re.compile(r'^\s*(?:virtual\s+)?(?:static\s+)?(?:inline\s+)?(?:explicit\s+)?'
-                             r'((?:const\s+)?(?:[\w:]+(?:<[^>]*>)?(?:\s*\*|\s*&|\s+))*)'  # return type
-                             r'([\w~]+(?:<[^>]*>)?)'  # function name
-                             r'\s*\((.*?)\)'  # parameters
-                             r'(?:\s*const)?'  # const qualifier
-                             r'(?:\s*noexcept)?'  # noexcept specifier
-                             r'(?:\s*override)?'  # override specifier
-                             r'(?:\s*=\s*0)?'  # pure virtual
-                             r'(?:\s*\{|\s*;)', re.MULTILINE | re.DOTALL)
-    
-    # Regular expression to match existing documentation
-    doc_pattern = re.compile(r'/\*\*.*?\*/\s*$|///.*$', re.MULTILINE | re.DOTALL)
-    
     # Find all .hpp and .cpp files in the hydra_math directory
-    for root, _, files in os.walk(directory):
-        # Only process files in hydra_math directory
-        if "hydra_math" not in root:
-            continue
-            
-        for filename in files:
-            if filename.lower().endswith(('.hpp', '.cpp')):
-                filepath = os.path.join(root, filename)
-                
-                try:
-                    # Read file content
-                    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                    
-                    # Split content into lines for processing
-                    lines = content.split('\n')
-                    modified_lines = lines.copy()
-                    changes_made = False
-                    
-                    # Find function declarations
-                    matches = list(func_pattern.finditer(content))
-                    
-                    for match in matches:
-                        # Get function details
-                        return_type = match.group(1).strip()
-                        func_name = match.group(2).strip()
-                        params_str = match.group(3).strip()
-                        
-                        # Skip if it's a constructor or destructor
-                        if func_name.startswith('~') or func_name == filename.split('.')[0]:
-                            continue
-                        
-                        # Parse parameters
-                        params = []
-                        if params_str:
-                            # Handle complex parameter lists with templates, etc.
-                            bracket_count = 0
-                            current_param = ""
-                            for char in params_str:
-                                if char == ',' and bracket_count == 0:
-                                    params.append(current_param.strip())
-                                    current_param = ""
-                                else:
-                                    current_param += char
-                                    if char == '<':
-                                        bracket_count += 1
-                                    elif char == '>':
-                                        bracket_count -= 1
-                            if current_param:
-                                params.append(current_param.strip())
-                        
-                        # Get the start line of the function
-                        func_start_line = content[:match.start()].count('\n')
-                        
-                        # Check if there's already documentation
-                        has_doc = False
-                        for i in range(max(0, func_start_line - 5), func_start_line):
-                            if i < len(lines) and ('/**' in lines[i] or '///' in lines[i]):
-                                has_doc = True
-                                break
-                        
-                        # Add documentation if not already present
-                        if not has_doc:
-                            # Generate documentation
-                            doc = generate_documentation(func_name, params, return_type)
-                            
-                            # Insert documentation before function
-                            modified_lines.insert(func_start_line, doc.rstrip())
-                            changes_made = True
-                            print(f"In {filepath}:")
-                            print(f"  Adding documentation for function: {func_name}")
-                    
-                    # Write changes to file if any were made
-                    if changes_made:
-                        modified_content = '\n'.join(modified_lines)
-                        if not dry_run:
-                            with open(filepath, 'w', encoding='utf-8') as f:
-                                f.write(modified_content)
-                            updated_files.append(filepath)
-                        else:
-                            print(f"[DRY RUN] Would update: {filepath}")
-                            updated_files.append(filepath)
-                
-                except Exception as e:
-                    print(f"ERROR: Failed to process {filepath}: {str(e)}")
-                    skipped_files.append((filepath, str(e)))
-    
-    return updated_files, skipped_files
+    source_files = (filepath for filepath in iter_source_files(directory, ('.hpp', '.cpp'))
+                    if "hydra_math" in os.path.dirname(filepath))
+    return rewrite_files(document_file, source_files, dry_run)
 
 def main():
+    buffer_stdout()
+    
     if len(sys.argv) < 2:
         print(f"Usage: {sys.argv[0]} <directory> [--dry-run]")
         print(f"Example: {sys.argv[0]} /Volumes/BIGCODE/hydra_sdk")
@@ -12,10 +12,29 @@ Handles case-insensitive filesystems by using a temporary filename during renami
 
 import os
 import sys
-import uuid
 import shutil
+import filecmp
+import itertools
 from pathlib import Path
 
+from source_tree_utils import buffer_stdout, iter_source_files
+
+# Source of unique temporary/backup name suffixes for this process
+_name_counter = itertools.count()
+
+def _unused_path(dirpath, prefix, ext):
+    """
+    Return a path in dirpath named prefix_<pid>_<n>ext that does not exist yet.
+    
+    The pid can repeat across runs and os.rename silently replaces an existing
+    file, so counter values whose name is already taken (e.g. left over by an
+    interrupted run) are skipped.
+    """
+    while True:
+        path = os.path.join(dirpath, f"{prefix}_{os.getpid()}_{next(_name_counter)}{ext}")
+        if not os.path.lexists(path):
+            return path
+
 def convert_to_lowercase(directory, exclude_dirs=None, revert_dirs=None):
     """
     Recursively find all .hpp and .cpp files in the given directory
@@ -45,31 +64,26 @@ def convert_to_lowercase(directory, exclude_dirs=None, revert_dirs=None):
     
     # First pass: collect all files that need to be renamed
     files_to_rename = []
-    for root, _, files in os.walk(directory):
-        # Skip excluded directories
-        should_exclude = False
-        for exclude_dir in exclude_dirs:
-            if root.startswith(exclude_dir):
-                should_exclude = True
-                break
-        if should_exclude:
-            continue
-            
-        for filename in files:
-            if filename.lower().endswith(('.cpp', '.hpp')):
-                filepath = os.path.join(root, filename)
-                lowercase_filename = filename.lower()
-                lowercase_filepath = os.path.join(root, lowercase_filename)
-                
-                if filename != lowercase_filename:
-                    files_to_rename.append((filepath, lowercase_filepath))
+    # Excluded directories are pruned during the walk
+    for filepath in iter_source_files(directory, ('.cpp', '.hpp'), exclude_dirs=exclude_dirs):
+        root, filename = os.path.split(filepath)
+        
+        lowercase_filename = filename.lower()
+        lowercase_filepath = os.path.join(root, lowercase_filename)
+        
+        if filename != lowercase_filename:
+            files_to_rename.append((filepath, lowercase_filepath))
     
     # Second pass: rename files using a temporary name first to avoid conflicts
     for filepath, lowercase_filepath in files_to_rename:
+        # Both paths share a directory; split them once for building sibling names
+        dirpath, lowercase_filename = os.path.split(lowercase_filepath)
+        lowercase_name, lowercase_ext = os.path.splitext(lowercase_filename)
+        _, ext = os.path.splitext(filepath)
+        
         try:
-            # Generate a temporary filename with a UUID to avoid conflicts
-            temp_filename = f"temp_{uuid.uuid4().hex}{os.path.splitext(filepath)[1]}"
-            temp_filepath = os.path.join(os.path.dirname(filepath), temp_filename)
+            # Generate a unique temporary filename to avoid conflicts
+            temp_filepath = _unused_path(dirpath, "temp", ext)
             
             # Step 1: Rename to temporary filename
             os.rename(filepath, temp_filepath)
@@ -77,8 +91,7 @@ def convert_to_lowercase(directory, exclude_dirs=None, revert_dirs=None):
             # Step 2: If lowercase file exists, back it up
             backup_filepath = None
             if os.path.exists(lowercase_filepath):
-                backup_filename = f"backup_{uuid.uuid4().hex}{os.path.splitext(lowercase_filepath)[1]}"
-                backup_filepath = os.path.join(os.path.dirname(lowercase_filepath), backup_filename)
+                backup_filepath = _unused_path(dirpath, "backup", lowercase_ext)
                 os.rename(lowercase_filepath, backup_filepath)
             
             # Step 3: Rename temporary file to lowercase
@@ -86,18 +99,17 @@ def convert_to_lowercase(directory, exclude_dirs=None, revert_dirs=None):
             
             # Step 4: If we had a backup, compare contents and keep newer file
             if backup_filepath:
-                # If files are identical, remove the backup
-                if os.path.getsize(backup_filepath) == os.path.getsize(lowercase_filepath):
-                    with open(backup_filepath, 'rb') as f1, open(lowercase_filepath, 'rb') as f2:
-                        if f1.read() == f2.read():
-                            os.remove(backup_filepath)
-                            print(f"Renamed: {filepath} -> {lowercase_filepath} (identical to existing file)")
-                            renamed_files.append((filepath, lowercase_filepath))
-                            continue
+                # If files are identical, remove the backup (compared in chunks,
+                # stopping at the first difference)
+                if filecmp.cmp(backup_filepath, lowercase_filepath, shallow=False):
+                    os.remove(backup_filepath)
+                    print(f"Renamed: {filepath} -> {lowercase_filepath} (identical to existing file)")
+                    renamed_files.append((filepath, lowercase_filepath))
+                    continue
                 
                 # Files differ, keep both with different names
-                alt_filename = f"{os.path.splitext(lowercase_filename)[0]}_alt{os.path.splitext(lowercase_filename)[1]}"
-                alt_filepath = os.path.join(os.path.dirname(lowercase_filepath), alt_filename)
+                alt_filename = f"{lowercase_name}_alt{lowercase_ext}"
+                alt_filepath = os.path.join(dirpath, alt_filename)
                 os.rename(backup_filepath, alt_filepath)
                 print(f"Renamed: {filepath} -> {lowercase_filepath} (kept existing as {alt_filename})")
             else:
@@ -150,102 +162,67 @@ def revert_lowercase_conversion(directory):
         lambda s: ''.join(word.capitalize() for word in s.split('_')),
     ]
     
-    for root, _, files in os.walk(directory):
-        for filename in files:
-            if filename.lower().endswith(('.cpp', '.hpp')):
-                filepath = os.path.join(root, filename)
-                
-                # Skip files that are not all lowercase
-                if filename != filename.lower():
-                    continue
-                    
-                name, ext = os.path.splitext(filename)
-                ext = ext[1:]  # Remove the dot
-                
-                # Try to find original capitalization
-                potential_original_names = []
-                
-                # Try different capitalization patterns for the name
-                for pattern in capitalization_patterns:
-                    potential_name = pattern(name)
-                    if potential_name != name:
-                        # Try different capitalization patterns for the extension
-                        for potential_ext in case_map.get(ext.lower(), [ext.upper(), ext.capitalize()]):
-                            potential_original_names.append(f"{potential_name}.{potential_ext}")
-                
-                # Also add the exact original extension cases
-                potential_original_names.append(f"{name.upper()}.{ext}")
-                potential_original_names.append(f"{name.capitalize()}.{ext}")
-                
-                # Remove duplicates
-                potential_original_names = list(set(potential_original_names))
-                
-                # Try to find any files in the same directory with similar names
-                similar_files = []
-                for root_dir, _, dir_files in os.walk(root):
-                    if root_dir != root:
-                        continue
-                    for dir_file in dir_files:
-                        if dir_file.lower() == filename.lower() and dir_file != filename:
-                            similar_files.append(dir_file)
+    for filepath in iter_source_files(directory, ('.cpp', '.hpp')):
+        root, filename = os.path.split(filepath)
+        
+        # Skip files that are not all lowercase
+        if filename != filename.lower():
+            continue
+            
+        name, ext = os.path.splitext(filename)
+        ext = ext[1:]  # Remove the dot
+        
+        # Try to find original capitalization
+        potential_original_names = []
+        
+        # Try different capitalization patterns for the name
+        for pattern in capitalization_patterns:
+            potential_name = pattern(name)
+            if potential_name != name:
+                # Try different capitalization patterns for the extension
+                for potential_ext in case_map.get(ext.lower(), [ext.upper(), ext.capitalize()]):
+                    potential_original_names.append(f"{potential_name}.{potential_ext}")
+        
+        # Also add the exact original extension cases
+        potential_original_names.append(f"{name.upper()}.{ext}")
+        potential_original_names.append(f"{name.capitalize()}.{ext}")
+        
+        # Remove duplicates
+        potential_original_names = list(set(potential_original_names))
+        
+        # Try each potential original name
+        for original_name in potential_original_names:
+            original_path = os.path.join(root, original_name)
+            
+            # Skip if the original path already exists
+            if os.path.exists(original_path):
+                continue
                 
-                if similar_files:
-                    # Use the similar file as the original name
-                    original_name = similar_files[0]
-                    original_path = os.path.join(root, original_name)
-                    
-                    # Generate a temporary filename
-                    temp_filename = f"temp_{uuid.uuid4().hex}{os.path.splitext(filepath)[1]}"
-                    temp_filepath = os.path.join(root, temp_filename)
-                    
+            # Generate a temporary filename
+            temp_filepath = _unused_path(root, "temp", f".{ext}")
+            
+            try:
+                # Rename to temp file first
+                os.rename(filepath, temp_filepath)
+                # Then rename to the potential original capitalization
+                os.rename(temp_filepath, original_path)
+                reverted_files.append((filepath, original_path))
+                print(f"Reverted: {filepath} -> {original_path} (best guess)")
+                break
+            except Exception as e:
+                print(f"ERROR: Failed to revert {filepath} to {original_path}: {str(e)}")
+                # Try to restore if possible
+                if os.path.exists(temp_filepath):
                     try:
-                        # Rename to temp file first
-                        os.rename(filepath, temp_filepath)
-                        # Then rename to the original capitalization
-                        os.rename(temp_filepath, original_path)
-                        reverted_files.append((filepath, original_path))
-                        print(f"Reverted: {filepath} -> {original_path}")
-                    except Exception as e:
-                        print(f"ERROR: Failed to revert {filepath}: {str(e)}")
-                        # Try to restore if possible
-                        if os.path.exists(temp_filepath):
-                            try:
-                                os.rename(temp_filepath, filepath)
-                            except:
-                                pass
-                elif potential_original_names:
-                    # Try each potential original name
-                    for original_name in potential_original_names:
-                        original_path = os.path.join(root, original_name)
-                        
-                        # Skip if the original path already exists
-                        if os.path.exists(original_path):
-                            continue
-                            
-                        # Generate a temporary filename
-                        temp_filename = f"temp_{uuid.uuid4().hex}{os.path.splitext(filepath)[1]}"
-                        temp_filepath = os.path.join(root, temp_filename)
-                        
-                        try:
-                            # Rename to temp file first
-                            os.rename(filepath, temp_filepath)
-                            # Then rename to the potential original capitalization
-                            os.rename(temp_filepath, original_path)
-                            reverted_files.append((filepath, original_path))
-                            print(f"Reverted: {filepath} -> {original_path} (best guess)")
-                            break
-                        except Exception as e:
-                            print(f"ERROR: Failed to revert {filepath} to {original_path}: {str(e)}")
-                            # Try to restore if possible
-                            if os.path.exists(temp_filepath):
-                                try:
-                                    os.rename(temp_filepath, filepath)
-                                except:
-                                    pass
+                        os.rename(temp_filepath, filepath)
+                    except:
+                        pass
     
     return reverted_files
 
 def main():
+    buffer_stdout()
+    
     if len(sys.argv) < 2:
         print(f"Usage: {sys.argv[0]} <directory> [--exclude dir1,dir2,...] [--revert dir1,dir2,...]")
         print(f"Example: {sys.argv[0]} /Volumes/BIGCODE/hydra_sdk --exclude /Volumes/BIGCODE/hydra_sdk/lib")
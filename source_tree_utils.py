@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Helpers shared by the hydra_sdk source maintenance scripts:
+1. Walking a source tree for files with given extensions
+2. Running a per-file worker over those files in parallel worker processes
+3. Writing the modified files back atomically
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+# Number of files handed to a worker process per task; a single file is
+# usually far cheaper to process than the round trip to the worker
+FILES_PER_TASK = 128
+
+def iter_source_files(root, exts, skip_substrings=(), exclude_dirs=()):
+    """
+    Recursively yield files under root whose names end with one of exts.
+    
+    Uses os.scandir directly so the cached DirEntry type information is used
+    instead of the extra stat() call os.walk makes per entry.
+    
+    Args:
+        root: The root directory to start the search from
+        exts: Tuple of file extensions to match (case-insensitive)
+        skip_substrings: Directories whose path contains any of these are skipped
+        exclude_dirs: Directories that are not descended into at all
+    
+    Yields:
+        str: Absolute path of each matching file
+    """
+    # Every upper/lower case spelling of each extension, so names can be
+    # matched with one endswith() call instead of lowercasing each of them
+    suffixes = tuple(''.join(chars) for ext in exts
+                     for chars in itertools.product(*(dict.fromkeys((c.lower(), c.upper())) for c in ext)))
+    
+    # Normalize once so each directory is checked with a single set lookup;
+    # every path on the stack is built from the absolute root, so it is
+    # already comparable without normalizing it again
+    excluded = {os.path.abspath(d) for d in exclude_dirs}
+    
+    stack = [os.path.abspath(root)]
+    while stack:
+        current = stack.pop()
+        if current in excluded or any(s in current for s in skip_substrings):
+            continue
+        
+        # List the directory up front so callers may rename files while iterating
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        
+        for entry in entries:
+            # is_file() follows symlinks and raises for links that cannot be
+            # resolved (e.g. a link pointing at itself, ELOOP). Like os.walk,
+            # treat such entries as plain files so a matching name is still
+            # yielded and the caller reports it when it fails to open it.
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                is_file = entry.is_file()
+            except OSError:
+                is_file = True
+            if is_file and entry.name.endswith(suffixes):
+                yield entry.path
+
+def write_atomically(filepath, content):
+    """
+    Replace the contents of filepath without leaving it truncated on failure.
+    
+    The content is encoded once, written to a new temporary file next to the
+    real target with a single write and then renamed over it. Symlinks are
+    resolved first so the file they point at is updated, not replaced.
+    
+    Args:
+        filepath: The file to overwrite
+        content: The new file content as a string
+    """
+    data = content.encode('utf-8')
+    target = os.path.realpath(filepath)
+    fd, temp_filepath = tempfile.mkstemp(dir=os.path.dirname(target),
+                                         prefix=os.path.basename(target) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        shutil.copymode(target, temp_filepath)
+        os.replace(temp_filepath, target)
+    except Exception:
+        if os.path.exists(temp_filepath):
+            os.remove(temp_filepath)
+        raise
+
+def try_process_file(worker, filepath):
+    """
+    Run worker on one file, reporting failures instead of raising them.
+    
+    Used with executor.map, where an exception would abort the remaining
+    results.
+    
+    Args:
+        worker: Function returning (filepath, modified_content, messages)
+        filepath: Path of the file to process
+    
+    Returns:
+        tuple: (filepath, modified_content, messages, error) - error is None on
+        success, otherwise the message of the exception that was raised
+    """
+    try:
+        return (*worker(filepath), None)
+    except Exception as e:
+        return filepath, None, [], str(e)
+
+def rewrite_files(worker, filepaths, dry_run=False):
+    """
+    Run worker over filepaths in parallel and write back the files it changed.
+    
+    The worker only reads and analyses a file and returns
+    (filepath, modified_content, messages), with modified_content None if the
+    file needs no changes. All printing and writing happens here.
+    
+    Args:
+        worker: Module-level function to run in the worker processes
+        filepaths: Iterable of paths to process
+        dry_run: If True, only print changes without modifying files
+    
+    Returns:
+        tuple: (updated_files, skipped_files) - Lists of updated and skipped files
+    """
+    updated_files = []
+    skipped_files = []
+    
+    # Workers get the calling script's module-level patterns compiled once,
+    # either inherited on fork or compiled when the script is imported on
+    # spawn, so they need no initializer and each file reuses them
+    with ProcessPoolExecutor() as executor:
+        # Results come back in walk order, one batch of files per task
+        results = executor.map(functools.partial(try_process_file, worker), filepaths,
+                               chunksize=FILES_PER_TASK)
+        for filepath, modified_content, messages, error in results:
+            if error is not None:
+                print(f"ERROR: Failed to process {filepath}: {error}")
+                skipped_files.append((filepath, error))
+                continue
+            
+            if messages:
+                print('\n'.join(messages))
+            
+            try:
+                # Write changes to file if any were made
+                if modified_content is not None:
+                    if not dry_run:
+                        write_atomically(filepath, modified_content)
+                        updated_files.append(filepath)
+                    else:
+                        print(f"[DRY RUN] Would update: {filepath}")
+                        updated_files.append(filepath)
+            
+            except Exception as e:
+                print(f"ERROR: Failed to process {filepath}: {str(e)}")
+                skipped_files.append((filepath, str(e)))
+    
+    return updated_files, skipped_files
+
+def buffer_stdout():
+    """
+    Block-buffer stdout even on a terminal.
+    
+    The scripts print a progress line per file, which would otherwise each be
+    written and flushed separately.
+    """
+    sys.stdout.reconfigure(line_buffering=False)
@@ -12,11 +12,78 @@ import sys
 import re
 from pathlib import Path
 
+from source_tree_utils import buffer_stdout, iter_source_files, rewrite_files
+
+# Regular expression to match include statements for hydra_math headers
+INCLUDE_PATTERN = re.compile(r'#include\s+([<"])hydra_math/([A-Za-z0-9_]+\.hpp)([>"])')
+
+def replace_include(match):
+    """
+    Return the lowercase form of an INCLUDE_PATTERN match.
+    
+    Args:
+        match: An INCLUDE_PATTERN match object
+    
+    Returns:
+        str: The include statement with the header name lowercased
+    """
+    return f'#include {match.group(1)}hydra_math/{match.group(2).lower()}{match.group(3)}'
+
+def update_file_includes(filepath):
+    """
+    Rewrite the capitalized hydra_math includes of a single file.
+    
+    Runs in a worker process, so it only reads the file and leaves writing
+    the result to the caller.
+    
+    Args:
+        filepath: Path of the source or header file to process
+    
+    Returns:
+        tuple: (filepath, modified_content, messages) - modified_content is None
+        if no changes are needed, messages are the log lines for this file
+    """
+    messages = []
+    
+    # Read raw bytes so files without hydra_math includes are
+    # skipped before paying for a UTF-8 decode
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    
+    # Check if file contains any hydra_math includes
+    if b"hydra_math/" not in raw:
+        return filepath, None, messages
+    
+    content = raw.decode('utf-8', errors='ignore')
+    
+    # Collect the capitalized includes in a single pass
+    matches = [match for match in INCLUDE_PATTERN.finditer(content)
+               if match.group(2) != match.group(2).lower()]
+    if not matches:
+        return filepath, None, messages
+    
+    # Splice the lowercase includes between the unchanged slices of content
+    messages.append(f"In {filepath}:")
+    output = []
+    prev = 0
+    for match in matches:
+        new_include = replace_include(match)
+        messages.append(f"  {match.group(0)} -> {new_include}")
+        output.append(content[prev:match.start()])
+        output.append(new_include)
+        prev = match.end()
+    output.append(content[prev:])
+    modified_content = ''.join(output)
+    
+    return filepath, modified_content, messages
+
 def update_includes(directory, dry_run=False):
     """
     Find all files that include hydra_math headers with capitalized filenames
     and update those include statements to use lowercase filenames.
     
+    Files are scanned in parallel worker processes by rewrite_files.
+    
     Args:
         directory: The root directory to start the search from
         dry_run: If True, only print changes without modifying files
@@ -24,84 +91,14 @@ def update_includes(directory, dry_run=False):
     Returns:
         tuple: (updated_files, skipped_files) - Lists of updated and skipped files
     """
-    updated_files = []
-    skipped_files = []
-    
-    # Map of capitalized header names to lowercase versions
-    header_map = {
-        "BigInt.hpp": "bigint.hpp",
-        "BKZ.hpp": "bkz.hpp",
-        "ComplexMatrix.hpp": "complexmatrix.hpp",
-        "GaloisVector.hpp": "galoisvector.hpp",
-        "Huffman.hpp": "huffman.hpp",
-        "LatticeUtils.hpp": "latticeutils.hpp",
-        "LatticeSolver.hpp": "latticesolver.hpp",
-        "LLL.hpp": "lll.hpp",
-        "MatrixUtils.hpp": "matrixutils.hpp",
-        "Modular.hpp": "modular.hpp",
-        "Pedersen.hpp": "pedersen.hpp",
-        "Rational.hpp": "rational.hpp",
-        "Shamir.hpp": "shamir.hpp"
-    }
-    
-    # Regular expression to match include statements for hydra_math headers
-    include_pattern = re.compile(r'#include\s+([<"])hydra_math/([A-Za-z0-9_]+\.hpp)([>"])')
-    
-    # Find all source and header files
-    for root, _, files in os.walk(directory):
-        # Skip lib directory
-        if "/lib/" in root or "\\lib\\" in root:
-            continue
-            
-        for filename in files:
-            if filename.lower().endswith(('.cpp', '.hpp', '.h', '.cc', '.c', '.cxx')):
-                filepath = os.path.join(root, filename)
-                
-                try:
-                    # Read file content
-                    with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                        content = f.read()
-                    
-                    # Check if file contains any hydra_math includes
-                    if "hydra_math/" in content:
-                        # Replace capitalized header names with lowercase
-                        modified_content = content
-                        changes_made = False
-                        
-                        # Find all include statements
-                        for match in include_pattern.finditer(content):
-                            quote_type = match.group(1)
-                            header_name = match.group(2)
-                            quote_end = match.group(3)
-                            
-                            # Check if header name is in our map
-                            if header_name in header_map:
-                                old_include = f'#include {quote_type}hydra_math/{header_name}{quote_end}'
-                                new_include = f'#include {quote_type}hydra_math/{header_map[header_name]}{quote_end}'
-                                
-                                if old_include in modified_content:
-                                    modified_content = modified_content.replace(old_include, new_include)
-                                    changes_made = True
-                                    print(f"In {filepath}:")
-                                    print(f"  {old_include} -> {new_include}")
-                        
-                        # Write changes to file if any were made
-                        if changes_made:
-                            if not dry_run:
-                                with open(filepath, 'w', encoding='utf-8') as f:
-                                    f.write(modified_content)
-                                updated_files.append(filepath)
-                            else:
-                                print(f"[DRY RUN] Would update: {filepath}")
-                                updated_files.append(filepath)
-                
-                except Exception as e:
-                    print(f"ERROR: Failed to process {filepath}: {str(e)}")
-                    skipped_files.append((filepath, str(e)))
-    
-    return updated_files, skipped_files
+    # Find all source and header files, skipping the lib directory
+    source_files = iter_source_files(directory, ('.cpp', '.hpp', '.h', '.cc', '.c', '.cxx'),
+                                     skip_substrings=("/lib/", "\\lib\\"))
+    return rewrite_files(update_file_includes, source_files, dry_run)
 
 def main():
+    buffer_stdout()
+    
     if len(sys.argv) < 2:
         print(f"Usage: {sys.argv[0]} <directory> [--dry-run]")
         print(f"Example: {sys.argv[0]} /Volumes/BIGCODE/hydra_sdk")